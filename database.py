@@ -5,11 +5,11 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
-from typing import Union
+from typing import List, Union
 from pydantic import BaseModel
 
 # Load environment variables from .env file
@@ -22,34 +22,75 @@ database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    # One shared, pooled client for the whole process; zstd (zlib fallback) compresses wire traffic
+    _client = AsyncIOMotorClient(
+        database_url,
+        maxPoolSize=200,
+        minPoolSize=20,
+        socketTimeoutMS=5000,
+        serverSelectionTimeoutMS=2000,
+        retryWrites=True,
+        compressors="zstd,zlib",
+    )
     db = _client[database_name]
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
+def _require_db():
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
-    # Convert Pydantic model to dict if needed
-    if isinstance(data, BaseModel):
-        data_dict = data.model_dump()
-    else:
-        data_dict = data.copy()
-
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+def _prepare(data: Union[BaseModel, dict], now: datetime) -> dict:
+    """Copy a Pydantic model or dict into an insertable document with timestamps"""
+    data_dict = data.model_dump() if isinstance(data, BaseModel) else data.copy()
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
+    return data_dict
 
-    result = db[collection_name].insert_one(data_dict)
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    _require_db()
+    result = await db[collection_name].insert_one(_prepare(data, datetime.now(timezone.utc)))
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
-    cursor = db[collection_name].find(filter_dict or {})
+async def create_documents(collection_name: str, items: List[Union[BaseModel, dict]]):
+    """Insert several documents with timestamps in a single round-trip"""
+    _require_db()
+    now = datetime.now(timezone.utc)
+    result = await db[collection_name].insert_many([_prepare(item, now) for item in items], ordered=False)
+    return [str(_id) for _id in result.inserted_ids]
+
+def _documents_pipeline(filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Aggregation pipeline that renders `_id` server-side as a string `id` field"""
+    pipeline = [{"$match": filter_dict or {}}]
     if limit:
-        cursor = cursor.limit(limit)
-    
-    return list(cursor)
+        pipeline.append({"$limit": limit})
+    if projection:
+        pipeline.append({"$project": projection})
+    pipeline.append({"$addFields": {"id": {"$toString": "$_id"}}})
+    pipeline.append({"$project": {"_id": 0}})
+    return pipeline
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Get documents from collection, with `_id` rendered server-side as a string `id` field"""
+    _require_db()
+    cursor = db[collection_name].aggregate(_documents_pipeline(filter_dict, limit, projection))
+    return await cursor.to_list(limit or None)
+
+async def iter_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Like get_documents, but returns an async iterator over the cursor
+
+    The first document is fetched eagerly so connection and query errors reach the caller
+    before it starts a streamed response.
+    """
+    _require_db()
+    cursor = db[collection_name].aggregate(_documents_pipeline(filter_dict, limit, projection))
+    first = await anext(cursor, None)
+
+    async def rows():
+        if first is None:
+            return
+        yield first
+        async for doc in cursor:
+            yield doc
+
+    return rows()
@@ -1,12 +1,29 @@
+import asyncio
+import json
+import logging
 import os
+import re
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException
+import orjson
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from database import db, create_document, get_documents
-from schemas import Property
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.decorator import cache
+from pydantic import BaseModel, field_validator
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from database import db, create_document, create_documents, get_documents, iter_documents
+from schemas import Property, render_highlights
 
-app = FastAPI(title="Isherwood Developments API")
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="Isherwood Developments API", default_response_class=ORJSONResponse)
+
+# Environment is fixed for the life of the process (database.py has already loaded .env)
+DATABASE_URL_STATUS = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
+DATABASE_NAME_STATUS = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +34,83 @@ app.add_middleware(
 )
 
 
+async def backfill_city_lc(batch_size: int = 1000):
+    """Set city_lc on documents written before it existed
+
+    Lowercasing happens in Python so the result matches Property.city_lc and the filter exactly
+    (Mongo's $toLower is only defined for ASCII). The {city_lc: None} match is served by the
+    city_lc index, so once everything is backfilled this is a cheap no-op on each boot.
+    """
+    ops = []
+    async for doc in db["property"].find({"city_lc": None}, {"city": 1}):
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"city_lc": (doc.get("city") or "").lower()}}))
+        if len(ops) >= batch_size:
+            await db["property"].bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        await db["property"].bulk_write(ops, ordered=False)
+
+
+async def build_indexes():
+    """Create the indexes backing slug lookups and /properties filters"""
+    try:
+        await db["property"].create_index("slug", unique=True)
+        await db["property"].create_index("city_lc")
+        await backfill_city_lc()
+        await db["property"].create_index([("category", 1), ("city_lc", 1), ("status", 1)])
+        await db["property"].create_index("development_type")
+        await db["property"].create_index("commercial_type")
+        await db["property"].create_index("hospitality_type")
+    except Exception:
+        logger.warning("Could not create property indexes", exc_info=True)
+
+
+@app.on_event("startup")
+async def ensure_indexes():
+    """Build indexes in the background so an unreachable database cannot block startup"""
+    if db is None:
+        return
+    # Keep a reference so the task is not garbage collected mid-run
+    app.state.index_task = asyncio.create_task(build_indexes())
+
+
+class BoundedInMemoryBackend(InMemoryBackend):
+    """InMemoryBackend that caps its size; the stock one only drops expired keys when they are read again"""
+
+    def __init__(self, max_entries: int = 1024):
+        self._store = {}
+        self.max_entries = max_entries
+
+    async def set(self, key, value, expire=None):
+        await super().set(key, value, expire)
+        if len(self._store) <= self.max_entries:
+            return
+        async with self._lock:
+            now = self._now
+            for k in [k for k, v in self._store.items() if v.ttl_ts < now]:
+                del self._store[k]
+            # Still over the cap: evict the oldest entries first
+            while len(self._store) > self.max_entries:
+                del self._store[next(iter(self._store))]
+
+
+@app.on_event("startup")
+async def init_cache():
+    """Use Redis for response caching when configured, otherwise keep it in-process"""
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        from redis import asyncio as aioredis
+        from fastapi_cache.backends.redis import RedisBackend
+        FastAPICache.init(RedisBackend(aioredis.from_url(redis_url)), prefix="api-cache")
+    else:
+        FastAPICache.init(BoundedInMemoryBackend(), prefix="api-cache")
+
+
+async def invalidate_cache(namespace: str):
+    """Drop every cached response stored under a namespace"""
+    await FastAPICache.clear(namespace=namespace)
+
+
 @app.get("/")
 def read_root():
     return {"message": "Isherwood Developments API running"}
@@ -30,43 +124,88 @@ class PropertyFilter(BaseModel):
     city: Optional[str] = None
     status: Optional[str] = None
 
+    @field_validator("*", mode="before")
+    @classmethod
+    def normalize(cls, v):
+        # An empty query param means "no filter", not "match the empty string";
+        # values are matched against the lowercase forms stored in Mongo
+        return v.lower() if v else None
+
+
+# Filters that are matched against a differently named (normalized) Mongo field
+FILTER_FIELDS = {"city": "city_lc"}
+
+# Card-sized subset returned by the list endpoint; only the first image is sent
+LIST_PROJECTION = {
+    "name": 1,
+    "slug": 1,
+    "summary": 1,
+    "city": 1,
+    "status": 1,
+    "price": 1,
+    "category": 1,
+    "size_sqft": 1,
+    "lot_acres": 1,
+    "images": {"$slice": ["$images", 1]},
+}
+
+
+# Larger (or unbounded) listings are streamed row by row instead of built in memory and cached
+STREAM_LIMIT = 200
+
+
+@cache(expire=30, namespace="properties")
+async def get_property_cards(query: dict, limit: int, projection: dict) -> List[dict]:
+    """Cached page of property cards for a given filter combination"""
+    return await get_documents("property", query, limit, projection)
+
+
+async def stream_json_array(docs):
+    """Encode an async iterable of documents as a JSON array, one row at a time"""
+    yield b"["
+    first = True
+    async for doc in docs:
+        yield (b"" if first else b",") + orjson.dumps(doc, default=str)
+        first = False
+    yield b"]"
+
 
 @app.get("/properties", response_model=List[dict])
-def list_properties(
-    category: Optional[str] = None,
-    development_type: Optional[str] = None,
-    commercial_type: Optional[str] = None,
-    hospitality_type: Optional[str] = None,
-    city: Optional[str] = None,
-    status: Optional[str] = None,
-    limit: int = 50,
+async def list_properties(
+    filters: PropertyFilter = Depends(),
+    limit: int = Query(50, ge=0),
+    fields: Optional[str] = None,
 ):
-    """List properties with optional filters"""
-    query = {}
-    if category:
-        query["category"] = category
-    if development_type:
-        query["development_type"] = development_type
-    if commercial_type:
-        query["commercial_type"] = commercial_type
-    if hospitality_type:
-        query["hospitality_type"] = hospitality_type
-    if city:
-        query["city"] = city
-    if status:
-        query["status"] = status
-
-    props = get_documents("property", query, limit)
-    # Convert ObjectId to string
-    for p in props:
-        p["id"] = str(p.pop("_id", ""))
-    return props
+    """List properties with optional filters
+
+    `fields` is a comma-separated list of extra fields to include on top of the default card subset.
+    """
+    query = {FILTER_FIELDS.get(k, k): v for k, v in filters.model_dump(exclude_none=True).items()}
+
+    projection = dict(LIST_PROJECTION)
+    if fields:
+        # Sorted and deduplicated so equivalent requests share one cache key
+        requested = sorted({f.strip() for f in fields.split(",") if f.strip()})
+        unknown = [f for f in requested if f not in Property.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        for field in requested:
+            projection[field] = 1
+
+    if not limit or limit > STREAM_LIMIT:
+        docs = await iter_documents("property", query, limit, projection)
+        return StreamingResponse(stream_json_array(docs), media_type="application/json")
+    return await get_property_cards(query, limit, projection)
+
+
+# Storage-only denormalized fields kept out of the public detail payload
+DETAIL_PROJECTION = {"city_lc": 0, "highlights_text": 0}
 
 
 @app.get("/properties/{slug}")
-def get_property(slug: str):
+async def get_property(slug: str):
     """Get a single property by slug"""
-    doc = db["property"].find_one({"slug": slug})
+    doc = await db["property"].find_one({"slug": slug}, DETAIL_PROJECTION)
     if not doc:
         raise HTTPException(status_code=404, detail="Property not found")
     doc["id"] = str(doc.pop("_id"))
@@ -74,13 +213,14 @@ def get_property(slug: str):
 
 
 @app.post("/properties", status_code=201)
-def create_property(payload: Property):
+async def create_property(payload: Property, background: BackgroundTasks):
     """Create a new property"""
-    # Unique slug check
-    existing = db["property"].find_one({"slug": payload.slug})
-    if existing:
+    # Unique slug is enforced by the index created at startup
+    try:
+        inserted_id = await create_document("property", payload)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Slug already exists")
-    inserted_id = create_document("property", payload)
+    background.add_task(invalidate_cache, "properties")
     return {"id": inserted_id}
 
 
@@ -88,13 +228,44 @@ class ChatRequest(BaseModel):
     message: str
 
 
-@app.post("/properties/{slug}/chat")
-def chat_about_property(slug: str, body: ChatRequest):
-    """Very simple AI-like responder that answers from stored property data."""
-    doc = db["property"].find_one({"slug": slug})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Property not found")
-
+# Chat keywords grouped by the topic they ask about
+CHAT_TOPICS = {
+    "price": ["price", "cost", "listing"],
+    "size": ["size", "square", "sqft"],
+    "zoning": ["zoning", "use", "type"],
+    "status": ["status", "available"],
+}
+_KEYWORD_TOPIC = {kw: topic for topic, kws in CHAT_TOPICS.items() for kw in kws}
+# Lookahead so overlapping keywords are all reported in a single scan
+_KEYWORD_RE = re.compile("(?=(" + "|".join(map(re.escape, _KEYWORD_TOPIC)) + "))")
+
+
+def match_topics(text: str) -> set:
+    """Return the chat topics mentioned in an already-lowercased message"""
+    return {_KEYWORD_TOPIC[m.group(1)] for m in _KEYWORD_RE.finditer(text)}
+
+
+CHAT_CONTEXT_TTL = 300
+# Only the fields build_chat_context reads are fetched on a cache miss
+CHAT_CONTEXT_PROJECTION = {
+    "_id": 0,
+    "name": 1,
+    "category": 1,
+    "city": 1,
+    "status": 1,
+    "price": 1,
+    "size_sqft": 1,
+    "lot_acres": 1,
+    "development_type": 1,
+    "commercial_type": 1,
+    "hospitality_type": 1,
+    "highlights_text": 1,
+    "highlights": {"$slice": 5},
+}
+
+
+def build_chat_context(doc: dict) -> dict:
+    """Pre-render every reply fragment the heuristic chat can use for a property"""
     name = doc.get("name")
     category = doc.get("category")
     city = doc.get("city")
@@ -106,57 +277,90 @@ def chat_about_property(slug: str, body: ChatRequest):
     comm = doc.get("commercial_type")
     hosp = doc.get("hospitality_type")
     highlights = doc.get("highlights", [])
+    # Documents written before highlights_text existed are rendered here instead
+    highlights_text = doc.get("highlights_text")
+    if highlights_text is None:
+        highlights_text = render_highlights(highlights)
+
+    if price is not None:
+        price_lines = [f"- Current guidance price is ${price:,.0f}."]
+    else:
+        price_lines = ["- Pricing is available upon request."]
+
+    size_lines = []
+    if size:
+        size_lines.append(f"- Interior size is approx. {size:,.0f} sq ft.")
+    if acres:
+        size_lines.append(f"- Lot size is approx. {acres:.2f} acres.")
+
+    parts = [p.title() for p in (category, dev, comm, hosp) if p]
+    type_lines = ["- Property type: " + ", ".join(parts)] if parts else []
+
+    if highlights_text:
+        overview_lines = ["Key highlights:", highlights_text]
+    else:
+        overview_lines = ["Let me know if you'd like details on price, size, zoning, or availability."]
+
+    return {
+        "intro": f"You're asking about {name} in {city}. Here's what I can share:",
+        "price": price_lines,
+        "size": size_lines,
+        "zoning": type_lines,
+        "status": [f"- Status: {status.title() if status else 'Available'}"],
+        "overview": overview_lines,
+    }
+
+
+async def get_chat_context(slug: str) -> Optional[dict]:
+    """Return the cached chat context for a slug, building it from Mongo on a miss"""
+    backend = FastAPICache.get_backend()
+    key = f"{FastAPICache.get_prefix()}:chat:{slug}:context"
+    # A cache outage degrades to a direct Mongo read rather than failing the chat
+    try:
+        cached = await backend.get(key)
+    except Exception:
+        logger.warning("Error retrieving chat context %s from cache", key, exc_info=True)
+        cached = None
+    if cached:
+        return json.loads(cached)
+
+    doc = await db["property"].find_one({"slug": slug}, CHAT_CONTEXT_PROJECTION)
+    if not doc:
+        return None
+    ctx = build_chat_context(doc)
+    try:
+        await backend.set(key, json.dumps(ctx).encode(), expire=CHAT_CONTEXT_TTL)
+    except Exception:
+        logger.warning("Error setting chat context %s in cache", key, exc_info=True)
+    return ctx
+
+
+@app.post("/properties/{slug}/chat")
+async def chat_about_property(slug: str, body: ChatRequest):
+    """Very simple AI-like responder that answers from stored property data."""
+    ctx = await get_chat_context(slug)
+    if ctx is None:
+        raise HTTPException(status_code=404, detail="Property not found")
 
     # Heuristic responses
     q = (body.message or "").lower()
-    lines: List[str] = []
-    lines.append(f"You're asking about {name} in {city}. Here's what I can share:")
-
-    if "price" in q or "cost" in q or "listing" in q:
-        if price is not None:
-            lines.append(f"- Current guidance price is ${price:,.0f}.")
-        else:
-            lines.append("- Pricing is available upon request.")
-
-    if "size" in q or "square" in q or "sqft" in q:
-        if size:
-            lines.append(f"- Interior size is approx. {size:,.0f} sq ft.")
-        if acres:
-            lines.append(f"- Lot size is approx. {acres:.2f} acres.")
-
-    if "zoning" in q or "use" in q or "type" in q:
-        parts = []
-        if category:
-            parts.append(category.title())
-        if dev:
-            parts.append(dev.title())
-        if comm:
-            parts.append(comm.title())
-        if hosp:
-            parts.append(hosp.title())
-        if parts:
-            lines.append("- Property type: " + ", ".join(parts))
-
-    if "status" in q or "available" in q:
-        lines.append(f"- Status: {status.title() if status else 'Available'}")
-
-    if not any(keyword in q for keyword in ["price","cost","listing","size","square","sqft","zoning","use","type","status","available"]):
+    topics = match_topics(q)
+    lines: List[str] = [ctx["intro"]]
+    for topic in CHAT_TOPICS:
+        if topic in topics:
+            lines.extend(ctx[topic])
+    if not topics:
         # General overview
-        if highlights:
-            lines.append("Key highlights:")
-            for h in highlights[:5]:
-                lines.append(f"  • {h}")
-        if not highlights:
-            lines.append("Let me know if you'd like details on price, size, zoning, or availability.")
+        lines.extend(ctx["overview"])
 
     answer = "\n".join(lines)
     return {"reply": answer}
 
 
 @app.post("/seed")
-def seed_demo():
+async def seed_demo(background: BackgroundTasks):
     """Seed sample properties if collection is empty"""
-    count = db["property"].count_documents({})
+    count = await db["property"].estimated_document_count()
     if count > 0:
         return {"message": "Collection already seeded", "count": count}
 
@@ -235,43 +439,35 @@ def seed_demo():
         ),
     ]
 
-    for p in samples:
-        create_document("property", p)
+    inserted_ids = await create_documents("property", samples)
+    background.add_task(invalidate_cache, "properties")
 
-    return {"message": "Seeded demo properties", "count": len(samples)}
+    return {"message": "Seeded demo properties", "count": len(inserted_ids)}
 
 
 @app.get("/test")
-def test_database():
+@cache(expire=5, namespace="test")
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
-        "database_url": None,
-        "database_name": None,
+        "database_url": DATABASE_URL_STATUS,
+        "database_name": DATABASE_NAME_STATUS,
         "connection_status": "Not Connected",
         "collections": []
     }
 
+    if db is None:
+        response["database"] = "⚠️  Available but not initialized"
+        return response
+
+    response["connection_status"] = "Connected"
     try:
-        if db is not None:
-            response["database"] = "✅ Available"
-            response["database_url"] = "✅ Configured"
-            response["database_name"] = getattr(db, 'name', None) or "✅ Connected"
-            response["connection_status"] = "Connected"
-            try:
-                collections = db.list_collection_names()
-                response["collections"] = collections[:10]
-                response["database"] = "✅ Connected & Working"
-            except Exception as e:
-                response["database"] = f"⚠️  Connected but Error: {str(e)[:50]}"
-        else:
-            response["database"] = "⚠️  Available but not initialized"
+        collections = await db.list_collection_names()
+        response["collections"] = collections[:10]
+        response["database"] = "✅ Connected & Working"
     except Exception as e:
-        response["database"] = f"❌ Error: {str(e)[:50]}"
-
-    import os as _os
-    response["database_url"] = "✅ Set" if _os.getenv("DATABASE_URL") else "❌ Not Set"
-    response["database_name"] = "✅ Set" if _os.getenv("DATABASE_NAME") else "❌ Not Set"
+        response["database"] = f"⚠️  Connected but Error: {str(e)[:50]}"
     return response
 
 
@@ -1,9 +1,14 @@
 """
 Database Schemas for Isherwood Developments
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 from typing import Optional, List, Literal
 
+
+def render_highlights(highlights: List[str]) -> str:
+    """Bullet list of the first five highlights as shown in chat replies"""
+    return "\n".join(f"  • {h}" for h in highlights[:5])
+
 class Property(BaseModel):
     name: str = Field(..., description="Property name")
     slug: str = Field(..., description="URL-friendly identifier")
@@ -26,6 +31,18 @@ class Property(BaseModel):
     highlights: List[str] = Field(default_factory=list)
     coordinates: Optional[dict] = None  # {lat, lng}
 
+    @computed_field
+    @property
+    def city_lc(self) -> str:
+        """Lowercased city, stored alongside the display value for case-insensitive indexed filtering"""
+        return self.city.lower()
+
+    @computed_field
+    @property
+    def highlights_text(self) -> str:
+        """Bullet list of the first five highlights, stored so chat replies need no formatting"""
+        return render_highlights(self.highlights)
+
 class ChatMessage(BaseModel):
     property_id: str = Field(..., description="Related property id")
     role: Literal['user','assistant']